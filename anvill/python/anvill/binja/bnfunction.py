@@ -14,7 +14,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
-from typing import Tuple, Optional
+from typing import Dict, List, Tuple, Optional
 
 
 import binaryninja as bn
@@ -52,6 +52,10 @@ class BNFunction(Function):
         self._bn_func = None
         self._is_external = is_external
 
+        # typed registers found in the MLIL instructions, keyed by their
+        # index. Several LLIL instructions can share one MLIL instruction
+        self._mlil_types: Dict[int, List[Tuple[str, Type, Optional[int]]]] = {}
+
         # initialize bn_func if the binja object is of type `Function`
         self._bn_func_or_var = bn_func_or_var
         if isinstance(bn_func_or_var, bn.Function):
@@ -82,9 +86,7 @@ class BNFunction(Function):
         mem = program.memory
 
         ref_eas: Set[int] = set()
-        ea = self._bn_func.start
-        max_ea = self._bn_func.highest_address
-        self._fill_bytes(program, mem, ea, max_ea, ref_eas)
+        self._fill_bytes(program, mem, ref_eas)
 
         # Collect typed register info for this function
         for block in self._bn_func.llil:
@@ -112,7 +114,7 @@ class BNFunction(Function):
         # if its a definition, then Anvill will perform analysis of the function and produce information for the func
         for ref_ea in ref_eas:
             # If ref_ea is an invalid address
-            seg = program.bv.get_segment_at(ref_ea)
+            seg = program.segment_at(ref_ea)
             if seg is None:
                 continue
             program.try_add_referenced_entity(ref_ea, add_refs_as_defs)
@@ -125,32 +127,32 @@ class BNFunction(Function):
         that associate registers with pointer information if it exists.
         """
         results = []
-        if isinstance(item_or_list, list):
-            for item in item_or_list:
-                results.extend(self._extract_types_mlil(program, item, initial_inst))
-        elif isinstance(item_or_list, mlinst):
-            results.extend(
-                self._extract_types_mlil(program, item_or_list.operands, initial_inst)
-            )
-        elif isinstance(item_or_list, bn.Variable):
-            if item_or_list.type is None:
-                return results
-            # Sometimes the backing storage is a `temp` register, and not a real
-            # register. If so, ignore it.
-            # The use of LLIL_REG_IS_TEMP is correct here, as there is no MLIL equivalent
-            # and it seem to use the same underlying data
-            if bn.LLIL_REG_IS_TEMP(item_or_list.storage):
-                return results
-            # We only care about registers that represent pointers.
-            if item_or_list.type.type_class == bn.TypeClass.PointerTypeClass:
-                if (
-                    item_or_list.source_type
-                    == bn.VariableSourceType.RegisterVariableSourceType
-                ):
-                    reg_name = program.bv.arch.get_reg_name(item_or_list.storage)
-                    results.append(
-                        (reg_name, program.type_cache.get(item_or_list.type), None)
-                    )
+
+        # Walk the operand tree with an explicit stack; the items are pushed in
+        # reverse to visit them in the same order as a recursive walk
+        stack = [item_or_list]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, list):
+                stack.extend(reversed(item))
+            elif isinstance(item, mlinst):
+                stack.extend(reversed(item.operands))
+            elif isinstance(item, bn.Variable):
+                if item.type is None:
+                    continue
+                # Sometimes the backing storage is a `temp` register, and not a real
+                # register. If so, ignore it.
+                # The use of LLIL_REG_IS_TEMP is correct here, as there is no MLIL equivalent
+                # and it seem to use the same underlying data
+                if bn.LLIL_REG_IS_TEMP(item.storage):
+                    continue
+                # We only care about registers that represent pointers.
+                if item.type.type_class == bn.TypeClass.PointerTypeClass:
+                    if item.source_type == bn.VariableSourceType.RegisterVariableSourceType:
+                        reg_name = program.get_reg_name(item.storage)
+                        results.append(
+                            (reg_name, program.type_cache.get(item.type), None)
+                        )
         return results
 
     def _extract_types(
@@ -163,29 +165,37 @@ class BNFunction(Function):
         rdi, rsi as operands in the MLIL, we should check if they have pointer information)
         """
         results = []
+        has_registers = False
 
-        # item_or_list could be empty string, return early in such cases. The unimplemented
-        # operand shows up as empty string.
-        if not (item_or_list and str(item_or_list)):
-            return results
-
-        if isinstance(item_or_list, list):
-            for item in item_or_list:
-                results.extend(self._extract_types(program, item, initial_inst))
-        elif isinstance(item_or_list, llinst):
-            results.extend(
-                self._extract_types(program, item_or_list.operands, initial_inst)
-            )
-        elif isinstance(item_or_list, bn.lowlevelil.ILRegister):
-            # Check if the register is not temp. Need to check if the temp register is
-            # associated to pointer?? Look into MLIL to get more information
-            if (not bn.LLIL_REG_IS_TEMP(item_or_list.index)) and (
-                item_or_list.name not in ["x87control", "x87status"]
-            ):
+        # Walk the operand tree with an explicit stack; the items are pushed in
+        # reverse to visit them in the same order as a recursive walk
+        stack = [item_or_list]
+        while stack:
+            item = stack.pop()
+
+            # item could be empty string, skip it in such cases. The unimplemented
+            # operand shows up as empty string.
+            if not (item and str(item)):
+                continue
+
+            if isinstance(item, list):
+                stack.extend(reversed(item))
+            elif isinstance(item, llinst):
+                stack.extend(reversed(item.operands))
+            elif isinstance(item, bn.lowlevelil.ILRegister):
+                # Check if the register is not temp. Need to check if the temp register is
+                # associated to pointer?? Look into MLIL to get more information
+                if bn.LLIL_REG_IS_TEMP(item.index) or item.name in [
+                    "x87control",
+                    "x87status",
+                ]:
+                    continue
+
+                has_registers = True
                 try:
                     # For every register, is it a pointer?
                     possible_pointer: bn.function.RegisterValue = (
-                        initial_inst.get_reg_value(item_or_list.name)
+                        initial_inst.get_reg_value(item.name)
                     )
                     if (
                         possible_pointer.type
@@ -196,41 +206,52 @@ class BNFunction(Function):
                         # possible_pointer.type == bn.function.RegisterValueType.ConstantValue:
                         # Is there a scenario where a register has a ConstantValue type thats used as a pointer?
                         val_type = _convert_bn_llil_type(
-                            possible_pointer, item_or_list.info.size
-                        )
-                        results.append(
-                            (item_or_list.name, val_type, possible_pointer.value)
+                            possible_pointer, item.info.size
                         )
+                        results.append((item.name, val_type, possible_pointer.value))
                 except KeyError:
-                    DEBUG(f"Unsupported register {item_or_list.name}")
-
-                if initial_inst.mlil is not None:
+                    DEBUG(f"Unsupported register {item.name}")
+
+        # The MLIL of the instruction does not depend on the register, so it
+        # only needs to be walked once, and not once per register
+        if has_registers:
+            mlil_inst = initial_inst.mlil
+            if mlil_inst is not None:
+                mlil_results = self._mlil_types.get(mlil_inst.instr_index)
+                if mlil_results is None:
                     mlil_results = self._extract_types_mlil(
-                        program, initial_inst.mlil, initial_inst.mlil
+                        program, mlil_inst, mlil_inst
                     )
-                    results.extend(mlil_results)
+                    self._mlil_types[mlil_inst.instr_index] = mlil_results
+                results.extend(mlil_results)
         return results
 
-    def _fill_bytes(self, program, memory, start, end, ref_eas):
+    def _fill_bytes(self, program, memory, ref_eas):
         br = bn.BinaryReader(program.bv)
         for bb in self._bn_func.basic_blocks:
-            for ea in range(bb.start, bb.end):
-                seg = program.bv.get_segment_at(ea)
-                br.seek(ea)
-
-                # NOTE(artem): This is a workaround for binary ninja's fake
-                # .externs section, which is (correctly) mapped as
-                # not readable, not writable, and not executable.
-                # because it is a fictional creation of the disassembler.
-                # When something is marked as not accessible at all,
-                # assume it is readable and executable
-                is_executable = seg.executable
-                if seg.writable == seg.readable == False:
-                    is_executable = True
-
-                memory.map_byte(ea, br.read8(), seg.writable, is_executable)
-                inst = self._bn_func.get_low_level_il_at(ea)
-                if inst and not is_unimplemented(program.bv, inst):
+            # Basic blocks do not cross segments, so look up the segment
+            # and read the bytes once per block rather than once per byte
+            seg = program.segment_at(bb.start)
+
+            # NOTE(artem): This is a workaround for binary ninja's fake
+            # .externs section, which is (correctly) mapped as
+            # not readable, not writable, and not executable.
+            # because it is a fictional creation of the disassembler.
+            # When something is marked as not accessible at all,
+            # assume it is readable and executable
+            is_executable = seg.executable
+            if seg.writable == seg.readable == False:
+                is_executable = True
+
+            br.seek(bb.start)
+            data = br.read(bb.end - bb.start)
+            memory.map_bytes(bb.start, data, seg.writable, is_executable)
+
+        # Collect the xrefs once per IL instruction instead of querying the
+        # IL at every byte of the function
+        for block in self._bn_func.llil:
+            for inst in block:
+                if not is_unimplemented(program.bv, inst):
                     _collect_xrefs_from_inst(program.bv, program, inst, ref_eas)
 
 
@@ -249,61 +270,71 @@ def _convert_bn_llil_type(
 def _collect_xrefs_from_inst(
     bv, program, item_or_list, ref_eas, reftype=XrefType.XREF_NONE
 ):
-    """Recursively collect xrefs in a IL instructions"""
-
-    if isinstance(item_or_list, list):
-        for item in item_or_list:
-            _collect_xrefs_from_inst(bv, program, item, ref_eas, reftype)
-
-    # If the item is not IL instructions don't process it further
-    inst = item_or_list
-    if not (
-        isinstance(inst, bn.LowLevelILInstruction)
-        or isinstance(inst, bn.MediumLevelILInstruction)
-    ):
-        return
-
-    if is_unimplemented(bv, inst) or is_undef(bv, inst):
-        return
-
-    if is_function_call(bv, inst):
-        reftype = XrefType.XREF_CONTROL_FLOW
-
-    elif is_jump(bv, inst) or is_jump_to(bv, inst):
-        reftype = XrefType.XREF_CONTROL_FLOW
-        jump_targets = get_jump_targets(bv, inst.address)
-        for jump_ea, targets in jump_targets.items():
-            if len(targets) != 0:
-                program.set_control_flow_targets(jump_ea, targets, True)
-
-    elif is_memory_inst(bv, inst) or is_unimplemented_mem(bv, inst):
-        mem_il = inst.dest if is_store_inst(bv, inst) else inst.src
-
-        if is_constant(bv, mem_il):
-            reftype = XrefType.XREF_MEMORY
-        else:
-            reftype = XrefType.XREF_DISPLACEMENT
-
-        _collect_xrefs_from_inst(bv, program, mem_il, ref_eas, reftype)
-
-        for opnd in inst.operands:
-            _collect_xrefs_from_inst(bv, program, opnd, ref_eas)
-
-    elif is_constant_pointer(bv, inst):
-        const_ea = inst.constant
-        if is_code(bv, const_ea) and not XrefType.is_memory(bv, reftype):
-            ref_eas.add(const_ea)
-        elif is_data(bv, const_ea):
-            ref_eas.add(const_ea)
-
-    # Recursively look for the xrefs in operands
-    for opnd in inst.operands:
-        _collect_xrefs_from_inst(bv, program, opnd, ref_eas, reftype)
-
-    if isinstance(inst, bn.LowLevelILInstruction):
-        mlil_inst = inst.mlil
-        if mlil_inst is not None:
-            _collect_xrefs_from_inst(bv, program, mlil_inst, ref_eas)
+    """Collect xrefs in a IL instructions. The operand trees are walked with an
+    explicit work-stack rather than recursion, so that deeply nested expressions
+    do not hit the recursion limit. Items are pushed in reverse so that they get
+    visited in the same order as a recursive pre-order walk.
+    """
+
+    stack = [(item_or_list, reftype)]
+    while stack:
+        inst, reftype = stack.pop()
+
+        if isinstance(inst, list):
+            stack.extend((item, reftype) for item in reversed(inst))
+            continue
+
+        # If the item is not IL instructions don't process it further
+        ops = il_operations(inst)
+        if ops is None:
+            continue
+
+        op = inst.operation
+        if op in ops.unimplemented or op in ops.undef:
+            continue
+
+        # Look for the xrefs in the mlil after the operands
+        if isinstance(inst, bn.LowLevelILInstruction):
+            mlil_inst = inst.mlil
+            if mlil_inst is not None:
+                stack.append((mlil_inst, XrefType.XREF_NONE))
+
+        if op in ops.function_call:
+            reftype = XrefType.XREF_CONTROL_FLOW
+
+        elif op in ops.jump or op in ops.jump_to:
+            reftype = XrefType.XREF_CONTROL_FLOW
+            jump_targets = get_jump_targets(bv, inst.address)
+            for jump_ea, targets in jump_targets.items():
+                if len(targets) != 0:
+                    program.set_control_flow_targets(jump_ea, targets, True)
+
+        elif op in ops.memory or op in ops.unimplemented_mem:
+            mem_il = inst.dest if op in ops.store else inst.src
+
+            if is_constant(bv, mem_il):
+                reftype = XrefType.XREF_MEMORY
+            else:
+                reftype = XrefType.XREF_DISPLACEMENT
+
+            # Pushed in reverse: `mem_il` first, then the operands without
+            # a reference type, then the operands with `reftype` below
+            stack.extend((opnd, reftype) for opnd in reversed(inst.operands))
+            stack.extend(
+                (opnd, XrefType.XREF_NONE) for opnd in reversed(inst.operands)
+            )
+            stack.append((mem_il, reftype))
+            continue
+
+        elif op in ops.constant_pointer:
+            const_ea = inst.constant
+            if is_code(bv, const_ea) and not XrefType.is_memory(bv, reftype):
+                ref_eas.add(const_ea)
+            elif is_data(bv, const_ea):
+                ref_eas.add(const_ea)
+
+        # Look for the xrefs in operands
+        stack.extend((opnd, reftype) for opnd in reversed(inst.operands))
 
 
 def is_code(bv, addr):
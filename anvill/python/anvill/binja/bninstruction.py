@@ -14,154 +14,188 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
+from dataclasses import dataclass
+from typing import FrozenSet, Optional
+
+
 import binaryninja as bn
-from typing import Optional
 
 
-def is_constant(bv, inst):
-    if isinstance(inst, bn.LowLevelILInstruction):
-        return inst.operation in (
+@dataclass(frozen=True)
+class ILOperations:
+    """Sets of IL operations of a single IL level, grouped by the instruction
+    predicates below. They are built once at import so that the predicates are
+    a single set membership test on `inst.operation`."""
+
+    constant: FrozenSet
+    constant_pointer: FrozenSet
+    register: FrozenSet
+    function_call: FrozenSet
+    function_tailcall: FrozenSet
+    jump: FrozenSet
+    jump_to: FrozenSet
+    load: FrozenSet
+    store: FrozenSet
+    memory: FrozenSet
+    import_address: FrozenSet
+    push: FrozenSet
+    unimplemented: FrozenSet
+    unimplemented_mem: FrozenSet
+    undef: FrozenSet
+
+
+_LLIL_OPERATIONS = ILOperations(
+    constant=frozenset(
+        (
             bn.LowLevelILOperation.LLIL_CONST,
             bn.LowLevelILOperation.LLIL_CONST_PTR,
         )
-
-    elif isinstance(inst, bn.MediumLevelILInstruction):
-        return inst.operation in (
+    ),
+    constant_pointer=frozenset((bn.LowLevelILOperation.LLIL_CONST_PTR,)),
+    register=frozenset((bn.LowLevelILOperation.LLIL_REG,)),
+    function_call=frozenset(
+        (
+            bn.LowLevelILOperation.LLIL_CALL,
+            bn.LowLevelILOperation.LLIL_TAILCALL,
+            bn.LowLevelILOperation.LLIL_CALL_STACK_ADJUST,
+        )
+    ),
+    function_tailcall=frozenset((bn.LowLevelILOperation.LLIL_TAILCALL,)),
+    jump=frozenset((bn.LowLevelILOperation.LLIL_JUMP,)),
+    jump_to=frozenset((bn.LowLevelILOperation.LLIL_JUMP_TO,)),
+    load=frozenset((bn.LowLevelILOperation.LLIL_LOAD,)),
+    store=frozenset((bn.LowLevelILOperation.LLIL_STORE,)),
+    memory=frozenset(
+        (
+            bn.LowLevelILOperation.LLIL_LOAD,
+            bn.LowLevelILOperation.LLIL_STORE,
+        )
+    ),
+    import_address=frozenset(),
+    push=frozenset((bn.LowLevelILOperation.LLIL_PUSH,)),
+    unimplemented=frozenset((bn.LowLevelILOperation.LLIL_UNIMPL,)),
+    unimplemented_mem=frozenset((bn.LowLevelILOperation.LLIL_UNIMPL_MEM,)),
+    undef=frozenset((bn.LowLevelILOperation.LLIL_UNDEF,)),
+)
+
+
+_MLIL_OPERATIONS = ILOperations(
+    constant=frozenset(
+        (
             bn.MediumLevelILOperation.MLIL_CONST,
             bn.MediumLevelILOperation.MLIL_CONST_PTR,
         )
-
-    return False
-
-
-def is_constant_pointer(bv, inst):
+    ),
+    constant_pointer=frozenset((bn.MediumLevelILOperation.MLIL_CONST_PTR,)),
+    register=frozenset(),
+    function_call=frozenset(
+        (
+            bn.MediumLevelILOperation.MLIL_CALL,
+            bn.MediumLevelILOperation.MLIL_TAILCALL,
+            bn.MediumLevelILOperation.MLIL_CALL_UNTYPED,
+        )
+    ),
+    function_tailcall=frozenset((bn.MediumLevelILOperation.MLIL_TAILCALL,)),
+    jump=frozenset((bn.MediumLevelILOperation.MLIL_JUMP,)),
+    jump_to=frozenset((bn.MediumLevelILOperation.MLIL_JUMP_TO,)),
+    load=frozenset((bn.MediumLevelILOperation.MLIL_LOAD,)),
+    store=frozenset((bn.MediumLevelILOperation.MLIL_STORE,)),
+    memory=frozenset(
+        (
+            bn.MediumLevelILOperation.MLIL_LOAD,
+            bn.MediumLevelILOperation.MLIL_STORE,
+        )
+    ),
+    import_address=frozenset((bn.MediumLevelILOperation.MLIL_IMPORT,)),
+    push=frozenset(),
+    unimplemented=frozenset((bn.MediumLevelILOperation.MLIL_UNIMPL,)),
+    unimplemented_mem=frozenset((bn.MediumLevelILOperation.MLIL_UNIMPL_MEM,)),
+    undef=frozenset((bn.MediumLevelILOperation.MLIL_UNDEF,)),
+)
+
+
+def il_operations(inst) -> Optional[ILOperations]:
+    """Return the operation sets matching the IL level of `inst`, or `None`
+    if `inst` is not an IL instruction"""
     if isinstance(inst, bn.LowLevelILInstruction):
-        return inst.operation == bn.LowLevelILOperation.LLIL_CONST_PTR
+        return _LLIL_OPERATIONS
 
     elif isinstance(inst, bn.MediumLevelILInstruction):
-        return inst.operation == bn.MediumLevelILOperation.MLIL_CONST_PTR
+        return _MLIL_OPERATIONS
 
-    return False
+    return None
 
 
-def is_register_inst(bv, inst):
-    if isinstance(inst, bn.LowLevelILInstruction):
-        return inst.operation == bn.LowLevelILOperation.LLIL_REG
-
-    return False
+def is_constant(bv, inst):
+    ops = il_operations(inst)
+    return ops is not None and inst.operation in ops.constant
 
 
-def is_function_call(bv, inst):
-    if isinstance(inst, bn.LowLevelILInstruction):
-        return inst.operation in (
-            bn.LowLevelILOperation.LLIL_CALL,
-            bn.LowLevelILOperation.LLIL_TAILCALL,
-            bn.LowLevelILOperation.LLIL_CALL_STACK_ADJUST,
-        )
+def is_constant_pointer(bv, inst):
+    ops = il_operations(inst)
+    return ops is not None and inst.operation in ops.constant_pointer
 
-    elif isinstance(inst, bn.MediumLevelILInstruction):
-        return inst.operation in (
-            bn.MediumLevelILOperation.MLIL_CALL,
-            bn.MediumLevelILOperation.MLIL_TAILCALL,
-            bn.MediumLevelILOperation.MLIL_CALL_UNTYPED,
-        )
 
-    return False
+def is_register_inst(bv, inst):
+    ops = il_operations(inst)
+    return ops is not None and inst.operation in ops.register
 
 
-def is_function_tailcall(bv, inst):
-    if isinstance(inst, bn.LowLevelILInstruction):
-        return inst.operation in (bn.LowLevelILOperation.LLIL_TAILCALL,)
+def is_function_call(bv, inst):
+    ops = il_operations(inst)
+    return ops is not None and inst.operation in ops.function_call
 
-    elif isinstance(inst, bn.MediumLevelILInstruction):
-        return inst.operation in (bn.MediumLevelILOperation.MLIL_TAILCALL,)
 
-    return False
+def is_function_tailcall(bv, inst):
+    ops = il_operations(inst)
+    return ops is not None and inst.operation in ops.function_tailcall
 
 
 def is_jump(bv, inst):
-    if isinstance(inst, bn.LowLevelILInstruction):
-        return inst.operation in (bn.LowLevelILOperation.LLIL_JUMP,)
-
-    elif isinstance(inst, bn.MediumLevelILInstruction):
-        return inst.operation in (bn.MediumLevelILOperation.MLIL_JUMP,)
-
-    return False
+    ops = il_operations(inst)
+    return ops is not None and inst.operation in ops.jump
 
 
 def is_jump_to(bv, inst):
-    if isinstance(inst, bn.LowLevelILInstruction):
-        return inst.operation in (bn.LowLevelILOperation.LLIL_JUMP_TO,)
-
-    elif isinstance(inst, bn.MediumLevelILInstruction):
-        return inst.operation in (bn.MediumLevelILOperation.MLIL_JUMP_TO,)
-
-    return False
+    ops = il_operations(inst)
+    return ops is not None and inst.operation in ops.jump_to
 
 
 def is_load_inst(bv, inst):
-    if isinstance(inst, bn.LowLevelILInstruction):
-        return inst.operation == bn.LowLevelILOperation.LLIL_LOAD
-
-    elif isinstance(inst, bn.MediumLevelILInstruction):
-        return inst.operation == bn.MediumLevelILOperation.MLIL_LOAD
-
-    return False
+    ops = il_operations(inst)
+    return ops is not None and inst.operation in ops.load
 
 
 def is_store_inst(bv, inst):
-    if isinstance(inst, bn.LowLevelILInstruction):
-        return inst.operation in (bn.LowLevelILOperation.LLIL_STORE,)
-
-    elif isinstance(inst, bn.MediumLevelILInstruction):
-        return inst.operation in (bn.MediumLevelILOperation.MLIL_STORE,)
-
-    return False
+    ops = il_operations(inst)
+    return ops is not None and inst.operation in ops.store
 
 
 def is_memory_inst(bv, inst):
-    return is_load_inst(bv, inst) or is_store_inst(bv, inst)
+    ops = il_operations(inst)
+    return ops is not None and inst.operation in ops.memory
 
 
 def is_import_address(bv, inst):
-    if isinstance(inst, bn.MediumLevelILInstruction):
-        return inst.operation == bn.MediumLevelILOperation.MLIL_IMPORT
-
-    return False
+    ops = il_operations(inst)
+    return ops is not None and inst.operation in ops.import_address
 
 
 def is_push_inst(bv, inst):
-    if isinstance(inst, bn.LowLevelILInstruction):
-        return inst.operation == bn.LowLevelILOperation.LLIL_PUSH
-
-    return False
+    ops = il_operations(inst)
+    return ops is not None and inst.operation in ops.push
 
 
 def is_unimplemented(bv, inst):
-    if isinstance(inst, bn.LowLevelILInstruction):
-        return inst.operation == bn.LowLevelILOperation.LLIL_UNIMPL
-
-    elif isinstance(inst, bn.MediumLevelILInstruction):
-        return inst.operation == bn.MediumLevelILOperation.MLIL_UNIMPL
-
-    return False
+    ops = il_operations(inst)
+    return ops is not None and inst.operation in ops.unimplemented
 
 
 def is_unimplemented_mem(bv, inst):
-    if isinstance(inst, bn.LowLevelILInstruction):
-        return inst.operation == bn.LowLevelILOperation.LLIL_UNIMPL_MEM
-
-    elif isinstance(inst, bn.MediumLevelILInstruction):
-        return inst.operation == bn.MediumLevelILOperation.MLIL_UNIMPL_MEM
-
-    return False
+    ops = il_operations(inst)
+    return ops is not None and inst.operation in ops.unimplemented_mem
 
 
 def is_undef(bv, inst):
-    if isinstance(inst, bn.LowLevelILInstruction):
-        return inst.operation == bn.LowLevelILOperation.LLIL_UNDEF
-
-    elif isinstance(inst, bn.MediumLevelILInstruction):
-        return inst.operation == bn.MediumLevelILOperation.MLIL_UNDEF
-
-    return False
+    ops = il_operations(inst)
+    return ops is not None and inst.operation in ops.undef
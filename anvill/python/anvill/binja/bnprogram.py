@@ -15,9 +15,12 @@
 
 
 import binaryninja as bn
-from typing import Optional
+from dataclasses import dataclass
+from typing import Dict, List, Optional
 
+import bisect
 import struct
+import sys
 
 from .typecache import *
 from .bnfunction import *
@@ -44,6 +47,17 @@ def _is_function_pointer(bn_var):
     return False
 
 
+@dataclass(frozen=True)
+class Segment:
+    """Snapshot of the bounds and permissions of a binja segment"""
+
+    start: int
+    end: int
+    readable: bool
+    writable: bool
+    executable: bool
+
+
 class BNProgram(Program):
     def __init__(self, bv: bn.BinaryView, path: str):
         Program.__init__(self, _get_arch(bv), _get_os(bv))
@@ -51,6 +65,20 @@ class BNProgram(Program):
         self._bv: Final[bn.BinaryView] = bv
         self._type_cache: Final[TypeCache] = TypeCache(self._bv)
 
+        # Segments sorted by start address, with a parallel list of the start
+        # addresses to bisect. Looking up segments here avoids calling into
+        # binja for every address
+        self._segments: Final[List[Segment]] = [
+            Segment(seg.start, seg.end, seg.readable, seg.writable, seg.executable)
+            for seg in sorted(self._bv.segments, key=lambda seg: seg.start)
+        ]
+        self._segment_starts: Final[List[int]] = [
+            seg.start for seg in self._segments
+        ]
+
+        # register names by register index
+        self._reg_names: Final[Dict[int, str]] = {}
+
         try:
             self._init_func_thunk_ctrl_flow()
         except:
@@ -64,6 +92,35 @@ class BNProgram(Program):
     def type_cache(self):
         return self._type_cache
 
+    def segment_at(self, ea: int) -> Optional[Segment]:
+        """Return the segment containing `ea`, or `None` if `ea` is not
+        mapped by any segment."""
+        i = bisect.bisect_right(self._segment_starts, ea) - 1
+        if 0 <= i:
+            seg = self._segments[i]
+            if ea < seg.end:
+                return seg
+
+        # The table only checks the closest segment starting at or below
+        # `ea`. If segments overlap, `ea` may still be inside an earlier,
+        # larger segment, so let binja answer on a miss.
+        seg = self._bv.get_segment_at(ea)
+        if seg is None:
+            return None
+
+        return Segment(seg.start, seg.end, seg.readable, seg.writable, seg.executable)
+
+    def get_reg_name(self, reg_index: int) -> str:
+        """Return the name of the register with index `reg_index`. The names
+        are cached and interned, as the same few registers are looked up for
+        every register variable."""
+        name = self._reg_names.get(reg_index)
+        if name is None:
+            name = sys.intern(self._bv.arch.get_reg_name(reg_index))
+            self._reg_names[reg_index] = name
+
+        return name
+
     def _try_add_symbol(self, ea: int):
         sym: Optional[bn.Symbol] = self._bv.get_symbol_at(ea)
         if not sym:
@@ -76,7 +133,7 @@ class BNProgram(Program):
         raise an `InvalidVariableException` exception."""
 
         # raise exception if the variable has invalid address
-        seg = self._bv.get_segment_at(address)
+        seg = self.segment_at(address)
         if seg is None:
             raise InvalidVariableException("Invalid variable address")
 
@@ -195,7 +252,7 @@ class BNProgram(Program):
                     # if they does not follow calling convention
                     # e.g: int32_t main(int32_t arg1, void* arg2, int128_t arg3 @ q1, int64_t arg4 @ q2)
                     #
-                    storage_reg_name = self._bv.arch.get_reg_name(var.storage)
+                    storage_reg_name = self.get_reg_name(var.storage)
                     if not (
                         storage_reg_name in calling_conv.int_arg_reg
                         or storage_reg_name in calling_conv.float_arg_reg
@@ -411,35 +468,43 @@ class BNProgram(Program):
                 )
 
 
+# OS classes by a keyword looked for in the binja platform name
+_OS_BY_PLATFORM_KEYWORD = (
+    ("linux", LinuxOS),
+    ("mac", MacOS),
+    ("windows", WindowsOS),
+)
+
+
+# Arch classes by binja architecture name
+_ARCH_BY_NAME = {
+    "x86_64": AMD64Arch,
+    "x86": X86Arch,
+    "aarch64": AArch64Arch,
+    "armv7": AArch32Arch,
+    "thumb2": AArch32Arch,
+}
+
+
 def _get_os(bv):
     """OS class that gives access to OS-specific functionality."""
     platform = str(bv.platform)
-    if "linux" in platform:
-        return LinuxOS()
-    elif "mac" in platform:
-        return MacOS()
-    elif "windows" in platform:
-        return WindowsOS()
-    else:
-        raise UnhandledOSException(
-            "Missing operating system object type for OS '{}'".format(platform)
-        )
+    for keyword, os_class in _OS_BY_PLATFORM_KEYWORD:
+        if keyword in platform:
+            return os_class()
+
+    raise UnhandledOSException(
+        "Missing operating system object type for OS '{}'".format(platform)
+    )
 
 
 def _get_arch(bv):
     """Arch class that gives access to architecture-specific functionality."""
     name = bv.arch.name
-    if name == "x86_64":
-        return AMD64Arch()
-    elif name == "x86":
-        return X86Arch()
-    elif name == "aarch64":
-        return AArch64Arch()
-    elif name == "armv7":
-        return AArch32Arch()
-    elif name == "thumb2":
-        return AArch32Arch()
-    else:
+    arch_class = _ARCH_BY_NAME.get(name)
+    if arch_class is None:
         raise UnhandledArchitectureType(
             "Missing architecture object type for architecture '{}'".format(name)
         )
+
+    return arch_class()
@@ -43,12 +43,15 @@ class BNVariable(Variable):
         begin = self._address
         end = begin + self._type.size(self._arch)
 
-        for ea in range(begin, end):
-            br.seek(ea)
-            seg = bv.get_segment_at(ea)
+        # Map the variable one segment at a time, reading all of its bytes
+        # that fall in the segment at once
+        ea = begin
+        while ea < end:
+            seg = program.segment_at(ea)
             # _elf_header is getting recovered as variable
-            # get_segment_at(...) returns None for elf_header
+            # segment_at(...) returns None for elf_header
             if seg is None:
+                ea += 1
                 continue
 
             #NOTE(artem): This is a workaround for binary ninja's fake
@@ -64,4 +67,7 @@ class BNVariable(Variable):
             if seg.writable == seg.readable == False:
                 is_executable = True
 
-            mem.map_byte(ea, br.read8(), seg.writable, is_executable)
+            seg_end = min(end, seg.end)
+            br.seek(ea)
+            mem.map_bytes(ea, br.read(seg_end - ea), seg.writable, is_executable)
+            ea = seg_end
@@ -37,6 +37,10 @@ class CallingConvention:
         self._int_arg_regs = self._cc.int_arg_regs
         self._float_arg_regs = self._cc.float_arg_regs
 
+        # cursors into the argument register lists for `next_*_arg_reg`
+        self._int_arg_idx = 0
+        self._float_arg_idx = 0
+
         self._int_return_reg = self._cc.int_return_reg
         self._high_int_return_reg = self._cc.high_int_return_reg
         self._float_return_reg = self._cc.float_return_reg
@@ -83,16 +87,16 @@ class CallingConvention:
     @property
     def next_int_arg_reg(self):
         try:
-            reg_name = self._int_arg_regs[0]
-            del self._int_arg_regs[0]
+            reg_name = self._int_arg_regs[self._int_arg_idx]
+            self._int_arg_idx += 1
             return reg_name
         except:
             return None
 
     @property
     def next_float_arg_reg(self):
-        reg_name = self._float_arg_regs[0]
-        del self._float_arg_regs[0]
+        reg_name = self._float_arg_regs[self._float_arg_idx]
+        self._float_arg_idx += 1
         return reg_name
 
     @property
@@ -14,6 +14,9 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
+import sys
+
+
 import binaryninja as bn
 
 
@@ -25,13 +28,17 @@ from anvill.function import *
 from anvill.util import *
 
 
+# sentinel used to distinguish cache misses from cached values
+_MISS = object()
+
+
 class TypeCache:
     """The class provides API to recursively visit the binja types and convert
     them to the anvill `Type` instance. It maintains a cache of visited binja
     types to reduce lookup time.
     """
 
-    __slots__ = ("_bv", "_cache")
+    __slots__ = ("_bv", "_cache", "_dispatch", "_named_dispatch")
 
     # list of unhandled type classes which should log error
     _err_type_class = {
@@ -40,25 +47,85 @@ class TypeCache:
         bn.TypeClass.WideCharTypeClass: "WideCharTypeClass",
     }
 
+    # `IntegerType`, `FloatingPointType`, `VoidType` and `BoolType` intern
+    # their instances, but still run their constructors on every call. Keep
+    # the instances handed out by the conversions so they are a lookup away
+    _INTEGER_TYPES = {size: IntegerType(size, True) for size in (1, 2, 4, 8, 16)}
+    _FLOAT_TYPES = {size: FloatingPointType(size) for size in (2, 4, 8, 10, 12, 16)}
+    _VOID_TYPE = VoidType()
+    _BOOL_TYPE = BoolType()
+
     def __init__(self, bv):
         self._bv = bv
         self._cache = dict()
 
+        # Handlers for the type classes, called with the bn type and its
+        # cache key. A single lookup replaces a chain of type class compares
+        self._dispatch = {
+            bn.TypeClass.VoidTypeClass: lambda tinfo, key: TypeCache._VOID_TYPE,
+            bn.TypeClass.PointerTypeClass: self._convert_pointer,
+            bn.TypeClass.FunctionTypeClass: self._convert_function,
+            bn.TypeClass.ArrayTypeClass: self._convert_array,
+            bn.TypeClass.StructureTypeClass: self._convert_struct,
+            bn.TypeClass.EnumerationTypeClass: self._convert_enum,
+            bn.TypeClass.BoolTypeClass: lambda tinfo, key: TypeCache._BOOL_TYPE,
+            bn.TypeClass.IntegerTypeClass: (
+                lambda tinfo, key: self._convert_integer(tinfo)
+            ),
+            bn.TypeClass.FloatTypeClass: (
+                lambda tinfo, key: TypeCache._FLOAT_TYPES.get(tinfo.width)
+                or FloatingPointType(tinfo.width)
+            ),
+            bn.TypeClass.NamedTypeReferenceClass: (
+                lambda tinfo, key: self._convert_named_reference(tinfo)
+            ),
+        }
+
+        # Handlers for the named type reference classes, called with the named
+        # reference and the type it refers to
+        self._named_dispatch = {
+            bn.NamedTypeReferenceClass.StructNamedTypeClass: (
+                lambda named_tinfo, ref_type: self._convert_struct(
+                    ref_type, self._cache_key(ref_type)
+                )
+            ),
+            bn.NamedTypeReferenceClass.UnionNamedTypeClass: (
+                lambda named_tinfo, ref_type: self._convert_union(
+                    ref_type, self._cache_key(ref_type)
+                )
+            ),
+            bn.NamedTypeReferenceClass.TypedefNamedTypeClass: (
+                lambda named_tinfo, ref_type: self._convert_typedef(
+                    named_tinfo, self._cache_key(named_tinfo)
+                )
+            ),
+            bn.NamedTypeReferenceClass.EnumNamedTypeClass: (
+                lambda named_tinfo, ref_type: self._convert_enum(
+                    ref_type, self._cache_key(ref_type)
+                )
+            ),
+        }
+
     def _cache_key(self, tinfo: bn.types.Type):
-        """ Convert bn Type instance to cache key"""
-        return str(tinfo)
+        """ Convert bn Type instance to cache key. The same type strings recur
+        across the binary, so intern them to share storage and make key
+        comparisons on lookup cheap"""
+        return sys.intern(str(tinfo))
 
-    def _convert_struct(self, tinfo: bn.types.Type) -> Type:
+    def _convert_struct(self, tinfo: bn.types.Type, key: str) -> Type:
         """Convert bn struct type into a `Type` instance"""
 
         assert tinfo.type_class == bn.TypeClass.StructureTypeClass
 
-        if tinfo.structure.type == bn.StructureType.UnionStructureType:
-            return self._convert_union(tinfo)
+        # Each attribute access goes through the binja API; fetch them once
+        structure = tinfo.structure
+        structure_type = structure.type
+        if structure_type == bn.StructureType.UnionStructureType:
+            return self._convert_union(tinfo, key)
 
         assert (
-            tinfo.structure.type == bn.StructureType.StructStructureType
-            or tinfo.structure.type == bn.StructureType.ClassStructureType
+            structure_type == bn.StructureType.StructStructureType
+            or structure_type == bn.StructureType.ClassStructureType
         )
 
         ret = StructureType()
@@ -66,30 +133,31 @@ class TypeCache:
         # If struct has no registered name, don't put it in the cache. It
         # is anonymous struct and can cause cache collision
         if tinfo.registered_name:
-            self._cache[self._cache_key(tinfo)] = ret
+            self._cache[key] = ret
 
-        for elem in tinfo.structure.members:
+        for elem in structure.members:
             ret.add_element_type(self._convert_bn_type(elem.type))
 
         return ret
 
-    def _convert_union(self, tinfo: bn.types.Type) -> Type:
+    def _convert_union(self, tinfo: bn.types.Type, key: str) -> Type:
         """Convert bn union type into a `Type` instance"""
 
-        assert tinfo.structure.type == bn.StructureType.UnionStructureType
+        structure = tinfo.structure
+        assert structure.type == bn.StructureType.UnionStructureType
 
         ret = UnionType()
 
         # If union has no registered name, don't put it in the cache. It
         # is anonymous union and can cause cache collision
         if tinfo.registered_name:
-            self._cache[self._cache_key(tinfo)] = ret
-        for elem in tinfo.structure.members:
+            self._cache[key] = ret
+        for elem in structure.members:
             ret.add_element_type(self._convert_bn_type(elem.type))
 
         return ret
 
-    def _convert_enum(self, tinfo: bn.types.Type) -> Type:
+    def _convert_enum(self, tinfo: bn.types.Type, key: str) -> Type:
         """Convert bn enum type into a `Type` instance"""
 
         assert tinfo.type_class == bn.TypeClass.EnumerationTypeClass
@@ -100,51 +168,51 @@ class TypeCache:
         # is anonymous enum and can cause cache collision with other
         # anonymous enum
         if tinfo.registered_name:
-            self._cache[self._cache_key(tinfo)] = ret
+            self._cache[key] = ret
         # The underlying type of enum will be an Interger of size info.width
         ret.set_underlying_type(IntegerType(tinfo.width, False))
         return ret
 
-    def _convert_typedef(self, tinfo: bn.types.Type) -> Type:
+    def _convert_typedef(self, tinfo: bn.types.Type, key: str) -> Type:
         """ Convert bn typedef into a `Type` instance"""
 
         assert tinfo.type_class == bn.NamedTypeReferenceClass.TypedefNamedTypeClass
 
         ret = TypedefType()
-        self._cache[self._cache_key(tinfo)] = ret
+        self._cache[key] = ret
         ret.set_underlying_type(
             self._convert_bn_type(self._bv.get_type_by_name(tinfo.name))
         )
         return ret
 
-    def _convert_array(self, tinfo: bn.types.Type) -> Type:
+    def _convert_array(self, tinfo: bn.types.Type, key: str) -> Type:
         """ Convert bn pointer type into a `Type` instance"""
 
         assert tinfo.type_class == bn.TypeClass.ArrayTypeClass
 
         ret = ArrayType()
-        self._cache[self._cache_key(tinfo)] = ret
+        self._cache[key] = ret
         ret.set_element_type(self._convert_bn_type(tinfo.element_type))
         ret.set_num_elements(tinfo.count)
         return ret
 
-    def _convert_pointer(self, tinfo) -> Type:
+    def _convert_pointer(self, tinfo, key: str) -> Type:
         """ Convert bn pointer type into a `Type` instance"""
 
         assert tinfo.type_class == bn.TypeClass.PointerTypeClass
 
         ret = PointerType()
-        self._cache[self._cache_key(tinfo)] = ret
+        self._cache[key] = ret
         ret.set_element_type(self._convert_bn_type(tinfo.element_type))
         return ret
 
-    def _convert_function(self, tinfo) -> Type:
+    def _convert_function(self, tinfo, key: str) -> Type:
         """ Convert bn function type into a `Type` instance"""
 
         assert tinfo.type_class == bn.TypeClass.FunctionTypeClass
 
         ret = FunctionType()
-        self._cache[self._cache_key(tinfo)] = ret
+        self._cache[key] = ret
         ret.set_return_type(self._convert_bn_type(tinfo.return_value))
 
         for var in tinfo.parameters:
@@ -163,10 +231,10 @@ class TypeCache:
         # long double ty may get represented as int80_t. If the size
         # of the IntegerTypeClass is [10, 12], create a float type
         # int32_t (int32_t arg1, int80_t arg2 @ st0)
-        if tinfo.width in [1, 2, 4, 8, 16]:
-            return IntegerType(tinfo.width, True)
-        elif tinfo.width in [10, 12]:
-            return FloatingPointType(tinfo.width)
+        if tinfo.width in TypeCache._INTEGER_TYPES:
+            return TypeCache._INTEGER_TYPES[tinfo.width]
+        elif tinfo.width in (10, 12):
+            return TypeCache._FLOAT_TYPES[tinfo.width]
         else:
             # if width is not from one specified. get the default size
             # to bv.address_size
@@ -188,9 +256,8 @@ class TypeCache:
             # log and return Interger of width tinfo.width or self._bv.address_size
             if ref_type is None:
                 DEBUG(
-                    "WARNING: failed to get reference type for named references {}".format(
-                        named_tinfo
-                    )
+                    "WARNING: failed to get reference type for named references %s",
+                    named_tinfo,
                 )
                 return (
                     IntegerType(self._bv.address_size, False)
@@ -198,71 +265,39 @@ class TypeCache:
                     else IntegerType(tinfo.width, False)
                 )
 
-        if named_tinfo.type_class == bn.NamedTypeReferenceClass.StructNamedTypeClass:
-            return self._convert_struct(ref_type)
-
-        elif named_tinfo.type_class == bn.NamedTypeReferenceClass.UnionNamedTypeClass:
-            return self._convert_union(ref_type)
+        handler = self._named_dispatch.get(named_tinfo.type_class)
+        if handler is not None:
+            return handler(named_tinfo, ref_type)
 
-        elif named_tinfo.type_class == bn.NamedTypeReferenceClass.TypedefNamedTypeClass:
-            return self._convert_typedef(named_tinfo)
-
-        elif named_tinfo.type_class == bn.NamedTypeReferenceClass.EnumNamedTypeClass:
-            return self._convert_enum(ref_type)
-
-        else:
-            WARN(f"WARNING: Unknown named type {named_tinfo} not handled")
-            return (
-                IntegerType(self._bv.address_size, False)
-                if tinfo.width == 0
-                else IntegerType(tinfo.width, False)
-            )
+        WARN(f"WARNING: Unknown named type {named_tinfo} not handled")
+        return (
+            IntegerType(self._bv.address_size, False)
+            if tinfo.width == 0
+            else IntegerType(tinfo.width, False)
+        )
 
     def _convert_bn_type(self, tinfo: bn.types.Type) -> Type:
         """Convert an bn `Type` instance into a `Type` instance."""
 
-        if self._cache_key(tinfo) in self._cache:
-            return self._cache[self._cache_key(tinfo)]
-
-        # Void type
-        if tinfo.type_class == bn.TypeClass.VoidTypeClass:
-            return VoidType()
-
-        elif tinfo.type_class == bn.TypeClass.PointerTypeClass:
-            return self._convert_pointer(tinfo)
-
-        elif tinfo.type_class == bn.TypeClass.FunctionTypeClass:
-            return self._convert_function(tinfo)
-
-        elif tinfo.type_class == bn.TypeClass.ArrayTypeClass:
-            return self._convert_array(tinfo)
+        # Compute the key once and fold the membership test and the lookup
+        # into a single probe of the cache
+        key = self._cache_key(tinfo)
+        hit = self._cache.get(key, _MISS)
+        if hit is not _MISS:
+            return hit
 
-        elif tinfo.type_class == bn.TypeClass.StructureTypeClass:
-            return self._convert_struct(tinfo)
+        type_class = tinfo.type_class
+        handler = self._dispatch.get(type_class)
+        if handler is not None:
+            return handler(tinfo, key)
 
-        elif tinfo.type_class == bn.TypeClass.EnumerationTypeClass:
-            return self._convert_enum(tinfo)
-
-        elif tinfo.type_class == bn.TypeClass.BoolTypeClass:
-            return BoolType()
-
-        elif tinfo.type_class == bn.TypeClass.IntegerTypeClass:
-            return self._convert_integer(tinfo)
-
-        elif tinfo.type_class == bn.TypeClass.FloatTypeClass:
-            return FloatingPointType(tinfo.width)
-
-        elif tinfo.type_class == bn.TypeClass.NamedTypeReferenceClass:
-            return self._convert_named_reference(tinfo)
-
-        elif tinfo.type_class in TypeCache._err_type_class.keys():
+        if type_class in TypeCache._err_type_class:
             WARN(
-                f"WARNING: Unhandled type class {TypeCache._err_type_class[tinfo.type_class]}"
+                f"WARNING: Unhandled type class {TypeCache._err_type_class[type_class]}"
             )
-            return VoidType()
+            return TypeCache._VOID_TYPE
 
-        else:
-            raise UnhandledTypeException("Unhandled type: {}".format(str(tinfo)), tinfo)
+        raise UnhandledTypeException("Unhandled type: {}".format(str(tinfo)), tinfo)
 
     def get(self, ty) -> Type:
         """Type class that gives access to type sizes, printings, etc."""
@@ -14,6 +14,9 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
+import itertools
+
+
 class Memory(object):
     def __init__(self):
         self._bytes = {}
@@ -21,6 +24,17 @@ class Memory(object):
     def map_byte(self, ea, val, can_write, can_exec):
         self._bytes[ea] = (int(val & 0xFF), can_write, can_exec)
 
+    def map_bytes(self, ea, data, can_write, can_exec):
+        """Map the bytes-like `data` starting at `ea`. The entries are built
+        with `zip` and `itertools.repeat`, so the loop runs in C rather than
+        calling `map_byte` for each byte."""
+        self._bytes.update(
+            zip(
+                range(ea, ea + len(data)),
+                zip(data, itertools.repeat(can_write), itertools.repeat(can_exec)),
+            )
+        )
+
     def _extend_range(self, range_proto, ea, val, can_write, can_exec):
         if not len(range_proto):
             range_proto["address"] = ea